@@ -0,0 +1,49 @@
+"""Measure startup cost of the CLIs and the importable core.
+
+Usage: python benchmarks/import_time.py [--repeat N]
+"""
+import argparse
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+CASES = {
+    "python (baseline)": ["-c", "pass"],
+    "import plextools": ["-c", "import plextools"],
+    "import plextools.sync": ["-c", "import plextools.sync"],
+    "update.py --help": ["update.py", "--help"],
+    "playlist.py --help": ["playlist.py", "--help"],
+    "import plexapi + mutagen": ["-c", "import plexapi.myplex, mutagen"],
+}
+
+def time_case(case_args, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, *case_args], cwd=ROOT, capture_output=True, check=False)
+        timings.append(time.perf_counter() - start)
+
+        if result.returncode != 0:
+            return None
+
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    for name, case_args in CASES.items():
+        timings = time_case(case_args, args.repeat)
+        if timings is None:
+            print(f"{name:<28} failed")
+            continue
+
+        print(f"{name:<28} median {statistics.median(timings) * 1000:8.1f} ms  min {min(timings) * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Importable core of the Plex library tools.
+
+Submodules import plexapi and mutagen lazily, so importing this package is
+cheap and a long-lived process can reuse one Plex session across many jobs.
+"""
+import importlib
+
+_EXPORTS = {
+    "map_path": "plextools.paths",
+    "extract_tag": "plextools.tags",
+    "extract_publisher": "plextools.tags",
+    "extract_genres": "plextools.tags",
+    "extract_year": "plextools.tags",
+    "extract_album": "plextools.tags",
+    "Rating": "plextools.tags",
+    "Track": "plextools.tags",
+    "connect": "plextools.plex",
+    "Run": "plextools.sync",
+    "sync_library": "plextools.sync",
+    "parse_m3u": "plextools.playlist",
+    "build_path_mapping": "plextools.playlist",
+    "sync_playlist": "plextools.playlist",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(importlib.import_module(module), name)
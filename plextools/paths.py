@@ -0,0 +1,15 @@
+import pathlib
+import os
+
+def map_path_str(plex_path: str) -> str:
+    SOURCE = os.getenv("LIBRARY_PATH_SOURCE", None)
+    TARGET = os.getenv("LIBRARY_PATH_TARGET", None)
+
+    mapped_path = plex_path
+    if (SOURCE is not None) and (TARGET is not None):
+        mapped_path = mapped_path.replace(SOURCE, TARGET).replace("\\", "/")
+
+    return mapped_path
+
+def map_path(plex_path: pathlib.Path) -> pathlib.Path:
+    return pathlib.Path(map_path_str(str(plex_path)))
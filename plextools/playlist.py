@@ -0,0 +1,59 @@
+import pathlib
+import logging
+import time
+from typing import List
+
+from plextools.paths import map_path_str
+
+def parse_m3u(m3u_file: pathlib.Path) -> List[pathlib.PurePosixPath]:
+    logging.info("Parsing M3U file")
+    m3u_paths = []
+    with open(m3u_file, "r", encoding="UTF8") as f:
+        for line in f.readlines():
+            mapped_path = map_path_str(str(pathlib.Path(line.strip())))
+            m3u_paths.append(pathlib.PurePosixPath(mapped_path))
+
+    return m3u_paths
+
+def build_path_mapping(section) -> dict:
+    start_time = time.time()
+    logging.info("Creating playlist mapping")
+
+    mapping = {}
+    for track in section.all(libtype="track"):
+        path = pathlib.PurePosixPath(track.media[0].parts[0].file)
+        mapping[path] = track
+
+    end_time = time.time()
+    logging.info(f"Done in {end_time - start_time}s")
+
+    return mapping
+
+def sync_playlist(plex, section, playlist_title: str, m3u_paths: List[pathlib.PurePosixPath], mapping: dict = None):
+    # pass a mapping from build_path_mapping to reuse it across playlists
+    if mapping is None:
+        mapping = build_path_mapping(section)
+
+    try:
+        plex.playlist(playlist_title).delete()
+        logging.info("Removed existing playlist")
+    except Exception as e:
+        pass
+
+    logging.debug(mapping)
+
+    plex_track_ids = []
+    for file in m3u_paths:
+        track = mapping.get(file)
+        if track is None:
+            logging.warning(f"Couldn't map {file}")
+            continue
+        plex_track_ids.append(track)
+
+    logging.debug(plex_track_ids)
+
+    logging.info(f"Adding {len(plex_track_ids)} tracks to {playlist_title}")
+
+    plex.createPlaylist(playlist_title, items=plex_track_ids)
+
+    logging.info(f"Added {len(plex_track_ids)} tracks to {playlist_title}")
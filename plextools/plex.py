@@ -0,0 +1,12 @@
+import os
+
+def connect(account: str = None, password: str = None, token: str = None, resource: str = None):
+    # plexapi is slow to import, so only pay for it when actually connecting
+    from plexapi.myplex import MyPlexAccount
+
+    plex_account = MyPlexAccount(
+        account or os.getenv("PLEX_ACCOUNT"),
+        password or os.getenv("PLEX_PASSWORD"),
+        token=token or os.getenv("PLEX_TOKEN")
+    )
+    return plex_account.resource(resource or os.getenv("PLEX_RESOURCE")).connect()
@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import pathlib
+from typing import Callable, List, Optional, TYPE_CHECKING
+from datetime import datetime
+import logging
+import os
+
+from plextools.paths import map_path
+from plextools.tags import Rating, Track
+
+if TYPE_CHECKING:
+    import mutagen
+
+def get_date_added(path: str):
+    # only stats the file, no need to parse tags
+    mapped_path = map_path(pathlib.Path(path))
+
+    try:
+        return datetime.fromtimestamp(os.path.getctime(mapped_path))
+    except OSError:
+        logging.debug(f"Couldn't find {path}")
+        return None
+
+def get_current_file_rating(file: mutagen.File):
+    result = file.get("rating")
+    return result[0]
+
+RatingConflictResolver = Callable[[str, Rating, Rating], Optional[Rating]]
+
+def skip_rating_conflict(track_path: str, file_rating: Rating, plex_rating: Rating) -> Optional[Rating]:
+    logging.warning(f"Rating conflict: {track_path}: file rating = {file_rating.value}, Plex rating = {plex_rating.value}, skipping")
+    return None
+
+class Run:
+    def __init__(self, dry_run: bool = False, resolve_rating_conflict: RatingConflictResolver = skip_rating_conflict):
+        self.dry_run = dry_run
+        self.resolve_rating_conflict = resolve_rating_conflict
+        self.actions = 0
+        self.pending_album_edits = 0
+
+    def begin_album_edits(self, album):
+        # queue album edits so each album is saved with a single request
+        self.pending_album_edits = 0
+
+        if self.dry_run:
+            return
+
+        album.batchEdits()
+
+    def save_album_edits(self, album):
+        if self.dry_run or not self.pending_album_edits:
+            return
+
+        self.pending_album_edits = 0
+
+        try:
+            album.saveEdits()
+        except Exception as e:
+            logging.error(f"Unable to update {album}")
+            logging.error(e)
+            pass
+
+    def update_file_rating(self, file: mutagen.File, new_rating: Rating):
+        current_file_rating = file.get("rating")
+        if current_file_rating is None:
+            # unrated in MusicBee
+            self.write_rating_to_file(file, new_rating)
+
+            return
+
+    def write_rating_to_file(self, file: mutagen.File, rating: Rating):
+        from mutagen.id3 import TextFrame
+
+        transformed_rating = rating.to_musicbee()
+        logging.debug(f"Writing {transformed_rating} ({rating}) to file")
+
+        if self.dry_run:
+            return
+        
+        if "rating" in file.tags:
+            if isinstance(file.tags["rating"], list):
+                file["rating"] = [transformed_rating]
+            else:
+                file["rating"] = TextFrame(encoding=3, text=transformed_rating)
+        else:
+            logging.debug("Ignoring since 'rating' not found in keys:")
+            logging.debug(file.tags.keys())
+            return
+
+        file.save()
+
+    def write_rating_to_plex_track(self, track, rating: Rating):
+        logging.debug(f"Writing {rating} to {track}")
+        self.actions += 1
+
+        if self.dry_run:
+            return
+
+        track.userRating = rating.to_plex()
+
+    def write_publisher_to_album(self, album, publisher: str):
+        if album.studio == publisher:
+            return
+
+        self.actions += 1
+
+        logging.debug(f"Writing record label '{publisher}' to {album}")
+
+        if self.dry_run:
+            return
+        
+        album.editStudio(publisher)
+        self.pending_album_edits += 1
+
+    def write_genres_to_entity(self, entity, incoming: List[str]):
+        incoming_genres = incoming
+        existing_genres = [g.tag for g in entity.genres]
+
+        logging.debug(f"{existing_genres} => {incoming_genres}")
+
+        adds = []
+        removes = []
+
+        # remove genres not in incoming list
+        for g in existing_genres:
+            if g.lower() not in [new_genre.lower() for new_genre in incoming_genres]:
+                logging.info(f"Removing genre {g} from {entity}")
+                self.actions += 1
+                removes.append(g)
+        
+        # add new genres
+        for g in incoming_genres:
+            if g.lower() not in [entity_genre.lower() for entity_genre in existing_genres]:
+                logging.info(f"Adding genre {g} to {entity}")
+                self.actions += 1
+                adds.append(g)
+        
+        if self.dry_run:
+            return False
+        
+        if adds:
+            entity.addGenre(adds)
+        
+        if removes:
+            entity.removeGenre(removes)
+
+        return bool(adds or removes)
+    
+    def write_genres_to_album(self, album, incoming: List[str]):
+        if self.write_genres_to_entity(album, incoming):
+            self.pending_album_edits += 1
+    
+    def write_genres_to_track(self, track, incoming: List[str]):
+        self.write_genres_to_entity(track, incoming)
+
+    def write_year_to_album(self, album, year: str):
+        if len(year) < 4:
+            if not album.year:
+                return
+
+            logging.debug(f"Removing year from {album}")
+            self.actions += 1
+
+            if self.dry_run:
+                return
+
+            album.editField("year", "")
+            album.editField("originallyAvailableAt", "")
+            self.pending_album_edits += 1
+            return
+        
+        simple_year = year[:4]
+
+        originally_available_at = None
+        try:
+            originally_available_at = datetime.strptime(year, "%Y-%m-%d")
+        except ValueError:
+            pass
+
+        if str(album.year) == simple_year and originally_available_at in (None, album.originallyAvailableAt):
+            return
+
+        logging.debug(f"Writing year {year} to {album}")
+        self.actions += 1
+
+        if self.dry_run:
+            return
+            
+        if originally_available_at is not None:
+            if album.originallyAvailableAt != originally_available_at:
+                album.editOriginallyAvailable(originally_available_at)
+
+        if str(album.year) != simple_year:
+            album.editField("year", simple_year)
+
+        self.pending_album_edits += 1
+
+    def update_plex_track(self, plex_track, track: Track):
+        if track.album == plex_track.parentTitle:
+            return
+        
+        logging.debug(f"Updating {plex_track} album from '{plex_track.parentTitle}' to '{track.album}'")
+        self.actions += 1
+
+        if self.dry_run:
+            return
+        
+        try:
+            # do nothing
+            # plex_track.parentKey = plex_track.artist().album(track.album).key
+            pass
+        except Exception as e:
+            logging.error(f"Unable to update {plex_track}")
+            logging.error(e)
+            pass
+
+    def sync_ratings(self, track):
+        track_path = track.locations[0]
+
+        if track.userRating is None:
+            # can try to import it
+            file = Track.from_file(track_path)
+            if file is None:
+                logging.debug(f"Skipping {track_path}")
+                return
+
+            if file.rating is None:
+                # nothing to do
+                return
+            
+            logging.debug(f"Processing {track_path}")
+
+            self.write_rating_to_plex_track(track, file.rating)
+
+            return
+        else:
+            # rated in Plex
+            import mutagen
+
+            logging.debug(f"Processing {track_path}")
+            file = mutagen.File(track_path)
+            if file.get("rating") is None:
+                # no local rating - update it
+                self.update_file_rating(file, Rating.from_plex(track.userRating))
+                return
+
+            # we have a local rating - see if it is the same
+            current_rating = Rating.from_musicbee(get_current_file_rating(file))
+
+            transformed_rating = Rating.from_plex(track.userRating)
+
+            if current_rating != transformed_rating:
+                new_rating = self.resolve_rating_conflict(track_path, current_rating, transformed_rating)
+                if new_rating is None:
+                    return
+
+                self.write_rating_to_file(file, new_rating)
+                self.write_rating_to_plex_track(track, new_rating)
+
+    def sync_publisher(self, album, first_track: Track):
+        label = first_track.label
+        if label is None:
+            # nothing to do
+            label = ""
+        
+        self.write_publisher_to_album(album, label)
+
+    def sync_genre(self, album, first_track: Track):
+        if first_track.genres is None:
+            # nothing to do
+            return
+        
+        self.write_genres_to_album(album, first_track.genres)
+
+    def sync_genre_track(self, track):
+        track_path = track.locations[0]
+
+        local_track = Track.from_file(track_path)
+        if local_track is None:
+            return
+        
+        if local_track.genres is None:
+            # nothing to do
+            return
+        
+        self.write_genres_to_track(track, local_track.genres)
+
+    def sync_year(self, album, first_track: Track):
+        year = first_track.year
+        if year is None:
+            year = ""
+        
+        self.write_year_to_album(album, year)
+
+    def sync_album(self, album, track):
+        track_path = track.locations[0]
+
+        this_track = Track.from_file(track_path)
+        if this_track is None:
+            return
+        
+        if this_track.album is None:
+            this_track.album = ""
+        
+        self.update_plex_track(track, this_track)
+
+    def sync_date_added(self, album, tracks):
+        # reduce over the whole album so it gets at most one edit
+        dates_added = [get_date_added(track.locations[0]) for track in tracks]
+        dates_added = [d for d in dates_added if d is not None]
+        if not dates_added:
+            return
+
+        earliest = min(dates_added).replace(microsecond=0)
+        if album.addedAt == earliest:
+            return
+
+        logging.debug(f"Updating {album} date added from {album.addedAt} to {earliest}")
+        self.actions += 1
+
+        if self.dry_run:
+            return
+        
+        album.editAddedAt(earliest)
+        self.pending_album_edits += 1
+
+def sync_library(section, run: Run, ratings: bool = False, publisher: bool = False, genre: bool = False,
+                 year: bool = False, track_metadata: bool = False, track_genres: bool = False,
+                 date_added: bool = False) -> int:
+    album_count = 0
+    for album in section.albums():
+        album.reload()
+        album_count += 1
+        only_need_first_track = not any((ratings, track_metadata, track_genres))
+
+        logging.debug(f"Processing album {album}")
+
+        original_actions = run.actions
+
+        tracks = album.tracks()
+
+        run.begin_album_edits(album)
+
+        for i, track in enumerate(tracks, start=0):
+            track.reload()
+            is_first_track = i == 0
+
+            if is_first_track and any((publisher, genre, year)):
+                # album fields come from the first track, parsed once
+                first_track = Track.from_file(track.locations[0])
+
+                if first_track is not None:
+                    if publisher:
+                        run.sync_publisher(album, first_track)
+                    
+                    if genre:
+                        run.sync_genre(album, first_track)
+                    
+                    if year:
+                        run.sync_year(album, first_track)
+
+            if ratings:
+                run.sync_ratings(track)
+            
+            if track_metadata:
+                run.sync_album(album, track)
+            
+            if track_genres:
+                run.sync_genre_track(track)
+            
+            if only_need_first_track:
+                break
+
+        if date_added:
+            run.sync_date_added(album, tracks)
+
+        run.save_album_edits(album)
+        
+        if run.actions == original_actions:
+            logging.debug("Nothing to do")
+
+    return album_count
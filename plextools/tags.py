@@ -0,0 +1,160 @@
+import pathlib
+from dataclasses import dataclass
+from typing import List
+from datetime import datetime
+import logging
+import os
+
+from plextools.paths import map_path
+
+def extract_tag(file, tag_options: List[str]):
+    for tag in tag_options:
+        match = file.tags.get(tag, None)
+        if match is not None:
+            return match
+    
+    return None
+
+def extract_publisher(file):
+    result = extract_tag(file, ["publisher", "organization", "TPUB"])
+    
+    if result is None:
+        return result
+    
+    if isinstance(result, list):
+        result = result[0]
+    
+    result = str(result)
+
+    result = result.split(";")[0].strip()
+    
+    return result
+
+def extract_genres(file):
+    result = extract_tag(file, ["genre", "TCON"])
+    
+    if result is None:
+        return result
+    
+    if isinstance(result, str):
+        result = [result]
+    
+    final_results = set()
+
+    for r in result:
+        r = r.lower()
+
+        if ";" in r:
+            for genre in r.split(";"):
+                final_results.add(genre.strip())
+        else:
+            final_results.add(r)
+    
+    return list(final_results)
+
+def extract_year(file):
+    result = extract_tag(file, ["year", "YEAR", "DATE"])
+    
+    if result is None:
+        return result
+    
+    if isinstance(result, list):
+        result = result[0]
+    
+    return result
+
+def extract_album(file):
+    result = None
+
+    if hasattr(file, "album"):
+        result = file.album
+
+    if result is None:
+        result = extract_tag(file, ["album", "ALBUM", "TALB"])
+
+    if result is None:
+        return result
+    
+    if isinstance(result, list):
+        result = result[0]
+    
+    return result
+
+@dataclass
+class Rating:
+    value: float  # rating in stars (out of five)
+
+    @staticmethod
+    def from_plex(str):
+        value = float(str) / 2.0
+        assert value <= 5.0, f"{value} > 5.0"
+        return Rating(value)
+
+    @staticmethod
+    def from_musicbee(str):
+        value = float(str) / 20.0
+        assert value <= 5.0, f"{value} > 5.0"
+        return Rating(value)
+    
+    def to_plex(self):
+        return str(self.value * 2.0)
+    
+    def to_musicbee(self):
+        return str(self.value)
+
+
+@dataclass
+class Track:
+    path: str = None
+    rating: Rating = None
+    label: str = None
+    genres: List[str] = None
+    year: str = None
+    album: str = None
+    date_added: datetime = None
+
+    @staticmethod
+    def from_file(path: str):
+        t = Track()
+        t.path = map_path(pathlib.Path(path))
+
+        if not t.path.exists():
+            logging.debug(f"Couldn't find {path}")
+            return None
+
+        t.date_added = datetime.fromtimestamp(os.path.getctime(t.path))
+
+        import mutagen
+
+        file = None
+        
+        try:
+            file = mutagen.File(t.path)
+        except Exception as e:
+            if isinstance(e, KeyboardInterrupt):
+                raise e
+            
+            logging.error(f"Error processing {t.path}")
+            logging.error(e)
+            return None
+        
+        if t.path.suffix == ".m4a":
+            # print(file.tags.keys())
+            pass
+
+        if file.get("rating", False):
+            rating = file.get("rating")[0]
+            t.rating = Rating.from_musicbee(rating)
+
+        t.label = extract_publisher(file)
+
+        t.genres = extract_genres(file)
+
+        t.year = extract_year(file)
+
+        t.album = extract_album(file)
+        
+        return t
+    
+    def write_to_file(self):
+        pass